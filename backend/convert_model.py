@@ -0,0 +1,147 @@
+"""
+Export the trained CPR model (cpr_model.keras) to faster inference formats.
+
+main.py picks up whichever exported file is present next to it.
+
+Usage:
+    python convert_model.py onnx
+    python convert_model.py tflite
+    python convert_model.py tflite-int8   # for ARM (glasses, Raspberry Pi)
+    python convert_model.py tflite-fp16   # for x86
+    python convert_model.py onnx --slim   # only the outputs main.py reads
+"""
+import argparse
+import logging
+import os
+import random
+
+import cv2
+import numpy as np
+
+import tensorflow as tf
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_KERAS_PATH = "./cpr_model.keras"
+MODEL_ONNX_PATH = "./cpr_model.onnx"
+MODEL_TFLITE_PATH = "./cpr_model.tflite"
+MODEL_TFLITE_INT8_PATH = "./cpr_model_int8.tflite"
+MODEL_TFLITE_FP16_PATH = "./cpr_model_fp16.tflite"
+# Saved uploads double as calibration data for full-integer quantization
+PHOTOS_DIR = "backend_photos"
+CALIBRATION_SAMPLES = 200
+
+# Batch dimension left open so the exported graph accepts any batch size
+INPUT_SPEC = tf.TensorSpec((None, 224, 224, 3), tf.float32, name="input")
+# Output units main.py reads (CNN_OUTPUT_INDICES there), in that order
+USED_OUTPUTS = [1, 3, 4, 7, 8]
+
+def slim_model(model: tf.keras.Model) -> tf.keras.Model:
+    """Rebuild the final Dense layer with only the USED_OUTPUTS units, keeping their trained weights"""
+    head = model.layers[-1]
+    if not isinstance(head, tf.keras.layers.Dense):
+        raise ValueError(f"--slim needs a model ending in a Dense layer, got {type(head).__name__}")
+    weights = head.get_weights()
+    slim_head = tf.keras.layers.Dense(
+        len(USED_OUTPUTS), activation=head.activation, use_bias=head.use_bias, name=f"{head.name}_slim"
+    )
+    outputs = slim_head(head.input)
+    slim_head.set_weights([weights[0][:, USED_OUTPUTS]] + ([weights[1][USED_OUTPUTS]] if head.use_bias else []))
+    return tf.keras.Model(model.inputs, outputs)
+
+def export_onnx(model: tf.keras.Model, output_path: str = MODEL_ONNX_PATH) -> None:
+    """Export to ONNX for onnxruntime"""
+    import tf2onnx
+
+    tf2onnx.convert.from_keras(model, input_signature=(INPUT_SPEC,), opset=13, output_path=output_path)
+    logger.info(f"Saved ONNX model to {output_path}")
+
+def export_tflite(model: tf.keras.Model, output_path: str = MODEL_TFLITE_PATH) -> None:
+    """Export to TFLite with post-training dynamic-range (INT8 weight) quantization"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    tflite_model = converter.convert()
+    with open(output_path, "wb") as f:
+        f.write(tflite_model)
+    logger.info(f"Saved TFLite model to {output_path} ({len(tflite_model)} bytes)")
+
+def calibration_paths() -> list:
+    """Pick up to CALIBRATION_SAMPLES uploads uniformly at random, in one scandir pass"""
+    # Reservoir sampling: spans the whole upload history instead of the oldest files,
+    # without building a list of every path; seeded so re-exports calibrate the same way
+    rng = random.Random(0)
+    paths = []
+    with os.scandir(PHOTOS_DIR) as it:
+        for i, entry in enumerate(e for e in it if e.name.endswith(".jpg")):
+            if i < CALIBRATION_SAMPLES:
+                paths.append(entry.path)
+            else:
+                j = rng.randint(0, i)
+                if j < CALIBRATION_SAMPLES:
+                    paths[j] = entry.path
+    return paths
+
+def representative_dataset():
+    """Yield uploads preprocessed exactly like main.py does (BGR, 224x224, [0,1])"""
+    paths = calibration_paths() if os.path.isdir(PHOTOS_DIR) else []
+    if not paths:
+        raise RuntimeError(f"No calibration images found in {PHOTOS_DIR}/")
+    for path in paths:
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        img = cv2.resize(img, (224, 224), interpolation=cv2.INTER_AREA).astype(np.float32) / 255.0
+        yield [img[np.newaxis]]
+
+def export_tflite_int8(model: tf.keras.Model, output_path: str = MODEL_TFLITE_INT8_PATH, integer_io: bool = False) -> None:
+    """Export to full-integer INT8 TFLite; main.py quantizes inputs and dequantizes outputs if integer_io is set"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    if integer_io:
+        # Drops the float<->int conversion ops at the graph edges
+        converter.inference_input_type = tf.uint8
+        converter.inference_output_type = tf.uint8
+    tflite_model = converter.convert()
+    with open(output_path, "wb") as f:
+        f.write(tflite_model)
+    logger.info(f"Saved INT8 TFLite model to {output_path} ({len(tflite_model)} bytes)")
+
+def export_tflite_fp16(model: tf.keras.Model, output_path: str = MODEL_TFLITE_FP16_PATH) -> None:
+    """Export to TFLite with float16 weights, which XNNPACK runs well on x86"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+    tflite_model = converter.convert()
+    with open(output_path, "wb") as f:
+        f.write(tflite_model)
+    logger.info(f"Saved FP16 TFLite model to {output_path} ({len(tflite_model)} bytes)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Export cpr_model.keras for inference")
+    parser.add_argument("format", choices=["onnx", "tflite", "tflite-int8", "tflite-fp16"], help="Output format")
+    parser.add_argument("--model", default=MODEL_KERAS_PATH, help="Path to the Keras model")
+    parser.add_argument("--integer-io", action="store_true", help="tflite-int8: use uint8 input/output tensors")
+    parser.add_argument("--slim", action="store_true", help="Only export the outputs main.py uses")
+    args = parser.parse_args()
+
+    model = tf.keras.models.load_model(args.model)
+    logger.info(f"Loaded Keras model from {args.model}")
+    if args.slim:
+        model = slim_model(model)
+        logger.info(f"Kept outputs {USED_OUTPUTS}")
+
+    if args.format == "onnx":
+        export_onnx(model)
+    elif args.format == "tflite":
+        export_tflite(model)
+    elif args.format == "tflite-int8":
+        export_tflite_int8(model, integer_io=args.integer_io)
+    elif args.format == "tflite-fp16":
+        export_tflite_fp16(model)
+
+if __name__ == "__main__":
+    main()
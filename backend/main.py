@@ -1,21 +1,54 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import BackgroundTasks, FastAPI, File, UploadFile, HTTPException, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
 import uvicorn
-import base64
-import io
 import os
+# Every server worker process loads its own models, so thread pools are sized to this worker's share of the cores
+WEB_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+CPU_BUDGET = max(1, (os.cpu_count() or 1) // WEB_WORKERS)
+TF_INTRA_OP_THREADS = int(os.getenv("TF_INTRA_OP_THREADS", min(4, CPU_BUDGET)))
+# Must be set before tensorflow is imported
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+# oneDNN's AVX2/AVX-512/AMX conv kernels; TF only turns them on by default on Linux x86
+os.environ.setdefault("TF_ENABLE_ONEDNN_OPTS", "1")
+# OpenMP pools (oneDNN inside TF) default to every core per pool; keep them to TF's intra-op budget
+os.environ.setdefault("OMP_NUM_THREADS", str(TF_INTRA_OP_THREADS))
 import cv2
 import numpy as np
 import mediapipe as mp
 import tensorflow as tf
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Optional, List, Tuple
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import bisect
+import hashlib
+import io
 import logging
+import math
+import platform
+import queue
+import threading
+import time
 from datetime import datetime
 from PIL import Image
 from pydantic import BaseModel
-import openai
-import json
+from openai import AsyncOpenAI
+import orjson
+import aiofiles
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    turbo_jpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    turbo_jpeg = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -25,8 +58,10 @@ logger = logging.getLogger(__name__)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 # Initialize OpenAI client if API key is provided
+openai_client = None
 if OPENAI_API_KEY:
-    openai.api_key = OPENAI_API_KEY
+    # A stalled completion gives up after 30s instead of holding the request open
+    openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=30.0, max_retries=1)
 else:
     logger.warning("OPENAI_API_KEY not found in environment variables")
 
@@ -34,7 +69,29 @@ else:
 PHOTOS_DIR = "backend_photos"
 os.makedirs(PHOTOS_DIR, exist_ok=True)
 
-app = FastAPI(title="Rescue CPR Backend", version="2.0.0")
+# Everything that serializes analysis results (responses and the QA sidecars) accepts the same values
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+class NumpyORJSONResponse(ORJSONResponse):
+    """ORJSONResponse that also accepts NumPy scalars and arrays, serialized natively by orjson"""
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the background work before the first request and release it on shutdown"""
+    start_batcher()
+    await preload_pose_detectors()
+    await prime_photo_index()
+    yield
+    await cnn_batcher.stop()
+    # Close the OpenAI client's pooled connections before the event loop goes away
+    if openai_client:
+        await openai_client.close()
+
+app = FastAPI(
+    title="Rescue CPR Backend", version="2.0.0", default_response_class=NumpyORJSONResponse, lifespan=lifespan
+)
 
 # Pydantic models for API requests/responses
 class SummaryRequest(BaseModel):
@@ -53,199 +110,806 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Prefer a TensorFlow Lite model if present; fall back to Keras
+# Prefer an ONNX model (when onnxruntime is installed), then TensorFlow Lite; fall back to Keras
+MODEL_ONNX_PATH = os.getenv("ORT_MODEL_PATH", "./cpr_model.onnx")
 MODEL_TFLITE_PATH = "./cpr_model.tflite"
+IS_ARM = platform.machine() in ("aarch64", "arm64", "armv7l")
+# Full-integer INT8 only pays off with ARM kernels; on x86 it is slower than float, so use FP16 there
+MODEL_TFLITE_VARIANT_PATH = "./cpr_model_int8.tflite" if IS_ARM else "./cpr_model_fp16.tflite"
+# Execution providers to try, best first; CPU is always available
+ORT_PROVIDERS = ("TensorrtExecutionProvider", "CUDAExecutionProvider", "OpenVINOExecutionProvider", "CPUExecutionProvider")
+# TensorRT builds an engine per input shape; FP16 kernels, and the built engines are cached on disk across restarts
+ORT_PROVIDER_OPTIONS = {
+    "TensorrtExecutionProvider": {
+        "trt_fp16_enable": True,
+        "trt_engine_cache_enable": True,
+        "trt_engine_cache_path": "./trt_cache",
+    },
+}
 MODEL_KERAS_PATH = "./cpr_model.keras"
+# MediaPipe Tasks pose model; the legacy Solutions Pose is used when it's missing
+POSE_TASK_PATH = "./pose_landmarker_lite.task"
+POSE_DELEGATE = os.getenv("POSE_DELEGATE", "cpu").lower()
+# Solutions Pose model for per-session tracking: 0 = lite, 1 = full, 2 = heavy
+POSE_MODEL_COMPLEXITY = int(os.getenv("POSE_MODEL_COMPLEXITY", "0"))
 cnn_model = None
-mp_pose = None
-pose_detector = None
+# Set once a PoseDetector has been built successfully; the detectors themselves live per thread / per session
+pose_available = False
+# Built at startup to check MediaPipe loads; the first inference thread adopts it instead of building its own
+spare_pose_detectors: List["PoseDetector"] = []
+
+def load_tflite_delegates() -> List[Any]:
+    """Load the first delegate from TFLITE_DELEGATES (comma-separated libraries, in preference order) that works"""
+    for library in filter(None, (name.strip() for name in os.getenv("TFLITE_DELEGATES", "").split(","))):
+        try:
+            delegate = tf.lite.experimental.load_delegate(library)
+        except (ValueError, OSError, RuntimeError) as e:
+            logger.warning(f"TFLite delegate {library} unavailable: {e}")
+            continue
+        # Ops the delegate can't run still fall back to the CPU kernels
+        logger.info(f"TFLite delegate loaded: {library}")
+        return [delegate]
+    logger.info("TFLite running on CPU (XNNPACK)")
+    return []
 
 class TFLitePredictor:
-    """Wrapper to mimic Keras .predict() using tf.lite.Interpreter."""
-    def __init__(self, model_path: str):
-        self.interpreter = tf.lite.Interpreter(model_path=model_path)
-        self.interpreter.allocate_tensors()
-        self.input_details = self.interpreter.get_input_details()
-        self.output_details = self.interpreter.get_output_details()
+    """Wrapper to mimic Keras .predict() using a pool of tf.lite.Interpreter instances."""
+    def __init__(self, model_path: str, pool_size: int = 2):
+        # An interpreter is not thread-safe, so each concurrent batch leases its own
+        pool_size = max(1, pool_size)
+        # Split the cores between interpreters; each one using all of them oversubscribes once batches overlap
+        num_threads = int(os.getenv("TFLITE_NUM_THREADS", 0)) or max(1, CPU_BUDGET // pool_size)
+        self.pool: "queue.Queue[Tuple[Any, Tuple[int, ...]]]" = queue.Queue()
+        for _ in range(pool_size):
+            interpreter = tf.lite.Interpreter(
+                model_path=model_path,
+                num_threads=num_threads,
+                experimental_delegates=load_tflite_delegates()
+            )
+            interpreter.allocate_tensors()
+            self.pool.put((interpreter, tuple(interpreter.get_input_details()[0]["shape"])))
+        self.concurrency = pool_size
+        self.input_details = interpreter.get_input_details()
+        self.output_details = interpreter.get_output_details()
         # Assume single input/output
         self.input_index = self.input_details[0]["index"]
         self.output_index = self.output_details[0]["index"]
         self.input_dtype = self.input_details[0]["dtype"]
+        self.output_dtype = self.output_details[0]["dtype"]
         # (scale, zero_point) for quantized models; may be (0.0, 0)
         self.quant_params = self.input_details[0].get("quantization", (0.0, 0))
+        self.output_quant_params = self.output_details[0].get("quantization", (0.0, 0))
+        # Multiply instead of dividing the whole batch by scale on every call
+        scale = self.quant_params[0]
+        self.inv_scale = 1.0 / scale if scale and scale > 0 else 1.0
+        # uint8 models take raw frames: x/255/scale + zp is a single affine map on the pixel values
+        self.uint8_alpha = self.inv_scale / 255.0 if self.input_dtype == np.uint8 and scale and scale > 0 else None
+        # Calibrated on [0,1] inputs the map is usually scale=1/255, zp=0, i.e. the pixels are already the tensor
+        self.uint8_identity = (
+            self.uint8_alpha is not None and math.isclose(self.uint8_alpha, 1.0, rel_tol=1e-4)
+            and self.quant_params[1] == 0
+        )
 
     def predict(self, x: np.ndarray, verbose: int = 0) -> np.ndarray:
         # x is expected to be batched: (N,H,W,C) float32 in [0,1]
         arr = x
-        if self.input_dtype == np.uint8:
-            scale, zero_point = self.quant_params
-            if scale and scale > 0:
-                arr = np.clip(np.round(arr / scale + zero_point), 0, 255).astype(np.uint8)
-            else:
-                arr = arr.astype(np.uint8)
+        if self.input_dtype in (np.uint8, np.int8):
+            # Full-integer model: quantize the [0,1] input to the tensor's integer range
+            limits = np.iinfo(self.input_dtype)
+            arr = np.multiply(arr, self.inv_scale, dtype=np.float32)
+            arr += self.quant_params[1]
+            arr = np.clip(np.rint(arr, out=arr), limits.min, limits.max, out=arr).astype(self.input_dtype)
         else:
-            arr = arr.astype(np.float32)
-        # Ensure input shape matches; avoid realloc if already correct
-        if tuple(self.input_details[0]["shape"]) != tuple(arr.shape):
-            self.interpreter.resize_tensor_input(self.input_index, arr.shape, strict=False)
-            self.interpreter.allocate_tensors()
-        self.interpreter.set_tensor(self.input_index, arr)
-        self.interpreter.invoke()
-        out = self.interpreter.get_tensor(self.output_index)
+            arr = arr.astype(np.float32, copy=False)
+        return self.invoke(arr)
+
+    def predict_frames(self, frames: List[np.ndarray], size: int) -> np.ndarray:
+        """Predict from 224x224 uint8 frames on a uint8-input model, run as a batch of size"""
+        def fill(input_tensor: np.ndarray) -> None:
+            # Frames are quantized straight into the interpreter's input tensor, so there is no
+            # staging batch and no set_tensor() copy; padding rows keep whatever they held
+            for i, frame in enumerate(frames):
+                if self.uint8_identity:
+                    input_tensor[i] = frame
+                else:
+                    # Saturating SIMD scale+shift; the result is never negative, so the abs() is a no-op
+                    cv2.convertScaleAbs(
+                        frame, dst=input_tensor[i], alpha=self.uint8_alpha, beta=float(self.quant_params[1])
+                    )
+        return self.invoke_with((size,) + frames[0].shape, fill)
+
+    def invoke(self, arr: np.ndarray) -> np.ndarray:
+        """Run one input-ready batch on a pooled interpreter"""
+        return self.invoke_with(arr.shape, lambda input_tensor: np.copyto(input_tensor, arr))
+
+    def invoke_with(self, shape: Tuple[int, ...], fill: Callable[[np.ndarray], None]) -> np.ndarray:
+        """Run one batch on a pooled interpreter, with fill writing the input into its input tensor"""
+        interpreter, input_shape = self.pool.get()
+        try:
+            # Ensure input shape matches; avoid realloc if already correct
+            if input_shape != shape:
+                interpreter.resize_tensor_input(self.input_index, shape, strict=False)
+                interpreter.allocate_tensors()
+                input_shape = shape
+            # invoke() refuses to run while a view of the tensor arena is alive, so the view is
+            # only referenced for the duration of fill()
+            fill(interpreter.tensor(self.input_index)())
+            interpreter.invoke()
+            out = interpreter.get_tensor(self.output_index)
+        finally:
+            self.pool.put((interpreter, input_shape))
+        if self.output_dtype in (np.uint8, np.int8):
+            # Integer outputs are dequantized so callers always see the float head values
+            scale, zero_point = self.output_quant_params
+            out = (out.astype(np.float32) - zero_point) * np.float32(scale)
         return out
 
+class ONNXPredictor:
+    """Wrapper to mimic Keras .predict() using onnxruntime.InferenceSession."""
+    def __init__(self, model_path: str):
+        sess_options = ort.SessionOptions()
+        sess_options.intra_op_num_threads = CPU_BUDGET
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        available = ort.get_available_providers()
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=sess_options,
+            providers=[(provider, ORT_PROVIDER_OPTIONS.get(provider, {})) for provider in ORT_PROVIDERS if provider in available]
+        )
+        # Looked up once so the hot path only does session.run()
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Models exported with a fixed batch dimension can't take bigger batches
+        self.max_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+
+    def predict(self, x: np.ndarray, verbose: int = 0) -> np.ndarray:
+        # x is expected to be batched: (N,H,W,C) float32 in [0,1]
+        return self.session.run(None, {self.input_name: x.astype(np.float32, copy=False)})[0]
+
+class KerasPredictor:
+    """Wrapper that runs a Keras model through a traced concrete function instead of .predict()."""
+    def __init__(self, model_path: str):
+        self.model = tf.keras.models.load_model(model_path)
+        # Trace once for the request shape; skips predict()'s per-call dataset/callback setup
+        self.infer = tf.function(lambda x: self.model(x, training=False)).get_concrete_function(
+            tf.TensorSpec([None, 224, 224, 3], tf.float32)
+        )
+
+    def predict(self, x: np.ndarray, verbose: int = 0) -> np.ndarray:
+        # x is expected to be batched: (N,H,W,C) float32 in [0,1]
+        return self.infer(tf.constant(x, dtype=tf.float32)).numpy()
+
+class PoseDetector:
+    """Gives the MediaPipe Tasks PoseLandmarker and the legacy Solutions Pose the same detect() call."""
+    def __init__(self, tracking: bool = False):
+        self.landmarker = None
+        self.pose = None
+        self.last_timestamp_ms = 0
+        if os.path.exists(POSE_TASK_PATH):
+            vision = mp.tasks.vision
+            # POSE_DELEGATE=gpu opts into the GPU delegate where MediaPipe supports it
+            delegate = mp.tasks.BaseOptions.Delegate.GPU if POSE_DELEGATE == "gpu" else mp.tasks.BaseOptions.Delegate.CPU
+            options = vision.PoseLandmarkerOptions(
+                base_options=mp.tasks.BaseOptions(model_asset_path=POSE_TASK_PATH, delegate=delegate),
+                # VIDEO mode tracks the pose ROI between frames instead of re-detecting every time
+                running_mode=vision.RunningMode.VIDEO if tracking else vision.RunningMode.IMAGE,
+                num_poses=1
+            )
+            self.landmarker = vision.PoseLandmarker.create_from_options(options)
+        elif tracking:
+            self.pose = mp.solutions.pose.Pose(
+                static_image_mode=False,
+                model_complexity=POSE_MODEL_COMPLEXITY,
+                enable_segmentation=False,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
+        else:
+            self.pose = mp.solutions.pose.Pose(
+                static_image_mode=True,
+                enable_segmentation=False,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
+        self.tracking = tracking
+        self.closed = False
+
+    def close(self) -> None:
+        """Free the native graph now instead of whenever the detector is garbage collected"""
+        self.closed = True
+        (self.landmarker or self.pose).close()
+
+    def detect(self, img_rgb: np.ndarray):
+        """Return the 33 normalized landmarks of the first person found, or None"""
+        if self.landmarker is not None:
+            image = mp.Image(image_format=mp.ImageFormat.SRGB, data=img_rgb)
+            if self.tracking:
+                # Video timestamps must strictly increase
+                self.last_timestamp_ms = max(int(time.monotonic() * 1000), self.last_timestamp_ms + 1)
+                result = self.landmarker.detect_for_video(image, self.last_timestamp_ms)
+            else:
+                result = self.landmarker.detect(image)
+            return result.pose_landmarks[0] if result.pose_landmarks else None
+        
+        results = self.pose.process(img_rgb)
+        return results.pose_landmarks.landmark if results.pose_landmarks else None
+
+class SessionPoseDetectors:
+    """One tracking PoseDetector per glasses session, dropped after sitting idle."""
+    def __init__(self, max_sessions: int = 32, idle_ttl: float = 60.0):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, Tuple[float, PoseDetector, threading.Lock]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Tuple[PoseDetector, threading.Lock]:
+        """Return the session's detector and the lock that serializes its frames"""
+        now = time.monotonic()
+        with self._lock:
+            # Refresh the session before evicting, so an active session never evicts itself
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                self._sessions[session_id] = (now, entry[1], entry[2])
+            evicted = self._evict(now)
+        self._close(evicted)
+        if entry is not None:
+            return entry[1], entry[2]
+        
+        # Building a graph takes hundreds of ms, so it happens outside the lock other sessions' frames need
+        detector = PoseDetector(tracking=True)
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is None:
+                entry, detector = (now, detector, threading.Lock()), None
+            self._sessions[session_id] = (now, entry[1], entry[2])
+            # Only a new session can push the table over capacity
+            evicted = self._evict(now)
+        if detector is not None:
+            # Another frame of the same session built one first
+            evicted.append((now, detector, threading.Lock()))
+        self._close(evicted)
+        return entry[1], entry[2]
+
+    def _evict(self, now: float) -> List[Tuple[float, PoseDetector, threading.Lock]]:
+        """Pop idle sessions, then least recently used ones beyond max_sessions; call with _lock held"""
+        evicted = []
+        # Oldest-used first, so idle sessions are always at the front
+        while self._sessions:
+            oldest_used, _, _ = next(iter(self._sessions.values()))
+            if now - oldest_used <= self.idle_ttl and len(self._sessions) <= self.max_sessions:
+                break
+            evicted.append(self._sessions.popitem(last=False)[1])
+        return evicted
+
+    @staticmethod
+    def _close(entries: List[Tuple[float, PoseDetector, threading.Lock]]) -> None:
+        """Close dropped detectors, waiting out any frame still running on them"""
+        for _, detector, lock in entries:
+            with lock:
+                detector.close()
+
+# Largest CNN batch the micro-batcher will form
+CNN_MAX_BATCH = 16
+
+def warmup_models():
+    """Run dummy forwards through the CNN so the first request doesn't pay graph/kernel setup (pose is primed per thread at startup)"""
+    if isinstance(cnn_model, TFLitePredictor):
+        # An interpreter only holds one input shape, so warming every bucket would just leave it sized for the
+        # last one; size each pooled interpreter for single frames, the batch light traffic runs at.
+        # The pool is FIFO, so consecutive calls visit every interpreter once
+        for _ in range(cnn_model.concurrency):
+            cnn_model.predict(np.zeros((1, 224, 224, 3), dtype=np.float32), verbose=0)
+    elif cnn_model:
+        # One pass per batch bucket, so XLA compiles and ONNX Runtime sizes its arenas before traffic arrives
+        fixed = getattr(cnn_model, "max_batch", None)
+        sizes = [fixed] if fixed else [1 << i for i in range(CNN_MAX_BATCH.bit_length())]
+        for size in sizes:
+            cnn_model.predict(np.zeros((size, 224, 224, 3), dtype=np.float32), verbose=0)
+
 try:
+    # Bound TF's thread pools so they don't oversubscribe cores alongside MediaPipe
+    tf.config.threading.set_intra_op_parallelism_threads(TF_INTRA_OP_THREADS)
+    tf.config.threading.set_inter_op_parallelism_threads(int(os.getenv("TF_INTER_OP_THREADS", "2")))
+    if os.getenv("USE_GPU", "false").lower() == "true":
+        for gpu in tf.config.list_physical_devices("GPU"):
+            tf.config.experimental.set_memory_growth(gpu, True)
+    else:
+        # Skip CUDA initialization on CPU-only deployments
+        tf.config.set_visible_devices([], "GPU")
+    
+    # Let XLA cluster the traced Keras graph
+    tf.config.optimizer.set_jit(True)
+
     # Load ML model
-    if os.path.exists(MODEL_TFLITE_PATH):
-        cnn_model = TFLitePredictor(MODEL_TFLITE_PATH)
-        logger.info(f"Loaded TFLite model from {MODEL_TFLITE_PATH}")
+    # On ARM the INT8 TFLite model beats ONNX Runtime's CPU kernels, so it wins when both exist
+    if ort is not None and os.path.exists(MODEL_ONNX_PATH) and not (IS_ARM and os.path.exists(MODEL_TFLITE_VARIANT_PATH)):
+        cnn_model = ONNXPredictor(MODEL_ONNX_PATH)
+        logger.info(f"Loaded ONNX model from {MODEL_ONNX_PATH} ({', '.join(cnn_model.session.get_providers())})")
+    elif os.path.exists(MODEL_TFLITE_VARIANT_PATH) or os.path.exists(MODEL_TFLITE_PATH):
+        tflite_path = MODEL_TFLITE_VARIANT_PATH if os.path.exists(MODEL_TFLITE_VARIANT_PATH) else MODEL_TFLITE_PATH
+        cnn_model = TFLitePredictor(tflite_path, int(os.getenv("TFLITE_POOL_SIZE", "2")))
+        logger.info(f"Loaded TFLite model from {tflite_path} ({cnn_model.concurrency} interpreters)")
     elif os.path.exists(MODEL_KERAS_PATH):
-        cnn_model = tf.keras.models.load_model(MODEL_KERAS_PATH)
+        cnn_model = KerasPredictor(MODEL_KERAS_PATH)
         logger.info(f"Loaded Keras model from {MODEL_KERAS_PATH}")
     else:
-        logger.warning("No model file found (cpr_model.tflite or cpr_model.keras). CNN features will be disabled.")
+        logger.warning("No model file found (cpr_model.onnx, cpr_model.tflite or cpr_model.keras). CNN features will be disabled.")
     
     # Initialize MediaPipe
-    mp_pose = mp.solutions.pose
-    pose_detector = mp_pose.Pose(
-        static_image_mode=True,
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5
-    )
-    logger.info("MediaPipe initialized")
+    spare_pose_detectors.append(PoseDetector())
+    pose_available = True
+    logger.info(f"MediaPipe initialized ({'Tasks PoseLandmarker' if spare_pose_detectors[0].landmarker else 'Solutions Pose'})")
 except Exception as e:
     logger.error(f"Error loading models: {e}")
 
-def get_angle(p1, p2, p3):
-    """Calculate angle between three points"""
-    v1 = p1 - p2
-    v2 = p3 - p2
-    cos = np.dot(v1, v2) / (np.linalg.norm(v1) * np.linalg.norm(v2) + 1e-6)
-    return np.degrees(np.arccos(np.clip(cos, -1, 1)))
+try:
+    warmup_models()
+    logger.info("Models warmed up")
+except Exception as e:
+    logger.error(f"Error warming up models: {e}")
+
+class AnalysisCache:
+    """Thread-safe LRU cache with a per-entry TTL for analysis results."""
+    def __init__(self, maxsize: int = 256, ttl: float = 5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[bytes, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: bytes) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: bytes, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+# Glasses often re-send near-identical frames; reuse their results for a few seconds
+frame_cache = AnalysisCache(maxsize=256, ttl=5.0)
+
+# (analysis, guidance) from /analyze-hands keyed by the exact upload bytes, for /upload-photo
+upload_cache = AnalysisCache(maxsize=256, ttl=30.0)
+
+def upload_key(image_bytes: bytes) -> bytes:
+    """Exact fingerprint of an upload's bytes"""
+    return hashlib.blake2b(image_bytes, digest_size=8).digest()
+
+def frame_key(img: np.ndarray) -> bytes:
+    """Cheap fingerprint of a decoded frame: hash of a 16x16 area-averaged thumbnail"""
+    thumb = cv2.resize(img, (16, 16), interpolation=cv2.INTER_AREA)
+    return hashlib.blake2b(thumb.tobytes(), digest_size=8).digest()
+
+# Large JPEGs are downscaled during decode, but never below this long edge (MediaPipe needs the detail)
+DECODE_MIN_SIDE = 640
+
+def jpeg_scale_denominator(width: int, height: int) -> int:
+    """Largest JPEG DCT downscale (8, 4 or 2) that keeps the long edge at DECODE_MIN_SIDE or more; 1 for none"""
+    for denom in (8, 4, 2):
+        if max(width, height) // denom >= DECODE_MIN_SIDE:
+            return denom
+    return 1
+
+# Decode-to-RGB flag, only in OpenCV 4.10+
+CV2_IMREAD_COLOR_RGB = getattr(cv2, "IMREAD_COLOR_RGB", None)
+# cv2.imdecode flags that let libjpeg scale down while decoding
+CV2_REDUCED_COLOR = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+# EXIF Orientation tag value -> the transform that makes the image upright (1, or no tag, is already upright)
+EXIF_ORIENTATION_TRANSFORMS = {
+    2: lambda img: cv2.flip(img, 1),
+    3: lambda img: cv2.rotate(img, cv2.ROTATE_180),
+    4: lambda img: cv2.flip(img, 0),
+    5: cv2.transpose,
+    6: lambda img: cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE),
+    7: lambda img: cv2.flip(cv2.transpose(img), -1),
+    8: lambda img: cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE),
+}
+
+def exif_orientation(image_bytes: bytes) -> int:
+    """EXIF Orientation tag of an image, 1 if it has none; Pillow only parses the header"""
+    try:
+        return Image.open(io.BytesIO(image_bytes)).getexif().get(0x0112, 1)
+    except (OSError, ValueError):
+        return 1
+
+def apply_orientation(img: np.ndarray, orientation: int) -> np.ndarray:
+    """Rotate/flip a decoded image upright the way cv2.imread does for its EXIF Orientation tag"""
+    transform = EXIF_ORIENTATION_TRANSFORMS.get(orientation)
+    return transform(img) if transform else img
+
+def decode_image(image_bytes: bytes) -> Optional[np.ndarray]:
+    """Decode to an RGB image, letting libjpeg(-turbo) downscale large JPEGs in the DCT domain"""
+    is_jpeg = image_bytes[:2] == b"\xff\xd8"
+    if turbo_jpeg is not None and is_jpeg:
+        try:
+            width, height = turbo_jpeg.decode_header(image_bytes)[:2]
+            denom = jpeg_scale_denominator(width, height)
+            # libjpeg-turbo writes RGB directly, so MediaPipe needs no channel swap
+            img = turbo_jpeg.decode(
+                image_bytes, pixel_format=TJPF_RGB, scaling_factor=(1, denom) if denom > 1 else None
+            )
+            # Unlike cv2.imdecode, TurboJPEG ignores EXIF; phones and glasses often store frames rotated
+            return apply_orientation(img, exif_orientation(image_bytes))
+        except OSError as e:
+            logger.warning(f"TurboJPEG decode failed, falling back to OpenCV: {e}")
+    
+    flags = cv2.IMREAD_COLOR
+    if is_jpeg:
+        try:
+            # Pillow only parses the header here; OpenCV has no header-only call
+            flags = CV2_REDUCED_COLOR[jpeg_scale_denominator(*Image.open(io.BytesIO(image_bytes)).size)]
+        except (OSError, ValueError):
+            pass
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    if flags == cv2.IMREAD_COLOR and CV2_IMREAD_COLOR_RGB is not None:
+        # OpenCV 4.10+ can emit RGB itself, skipping the full-frame swap below
+        return cv2.imdecode(nparr, CV2_IMREAD_COLOR_RGB)
+    img = cv2.imdecode(nparr, flags)
+    if img is None:
+        return None
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+
+def get_angle(ax, ay, az, bx, by, bz, cx, cy, cz):
+    """Calculate angle at point b between points a and c"""
+    # Plain float math: for 3-vectors NumPy's per-call overhead dwarfs the arithmetic
+    v1x, v1y, v1z = ax - bx, ay - by, az - bz
+    v2x, v2y, v2z = cx - bx, cy - by, cz - bz
+    dot = v1x * v2x + v1y * v2y + v1z * v2z
+    # atan2(|v1 x v2|, v1 . v2) keeps full precision near 180 degrees (straight arms), where acos flattens out,
+    # and needs no clamp or epsilon
+    cross = math.hypot(v1y * v2z - v1z * v2y, v1z * v2x - v1x * v2z, v1x * v2y - v1y * v2x)
+    return math.degrees(math.atan2(cross, dot))
+
+# Off by default: first-person glasses frames often show the hands and chest without a detectable full-body pose
+SKIP_CNN_WITHOUT_POSE = os.getenv("SKIP_CNN_WITHOUT_POSE", "false").lower() == "true"
+
+# Long-edge cap for frames handed to MediaPipe; the pose models run at 256x256 internally, so
+# lower values trade a little landmark precision for less resize and detection work
+POSE_MAX_SIDE = int(os.getenv("POSE_MAX_SIDE", "640"))
+# MediaPipe pose landmark indices used by run_pose
+LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST, RIGHT_WRIST = 11, 13, 15, 16
+
+# Pose and CNN run side by side; both libraries release the GIL inside their native code
+# At least two, so pose and CNN can still overlap on a small core budget
+INFERENCE_WORKERS = max(2, min(4, CPU_BUDGET))
+INFERENCE_POOL = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS)
+# Decoding gets its own threads, so a burst of uploads can't hold up batches waiting on the model
+PREPROCESS_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("PREPROCESS_WORKERS", "4")))
+# Frames tagged with a session_id go to that session's tracking detector
+session_pose_detectors = SessionPoseDetectors()
+
+# Per-thread scratch arrays, so steady-state requests don't churn the allocator
+_thread_buffers = threading.local()
+
+def thread_pose_detector() -> PoseDetector:
+    """Return this thread's static-image detector; a MediaPipe graph may not be entered from two threads at once"""
+    detector = getattr(_thread_buffers, "pose_detector", None)
+    if detector is None:
+        try:
+            # list.pop() is atomic, so only one thread gets the startup instance
+            detector = spare_pose_detectors.pop()
+        except IndexError:
+            detector = PoseDetector()
+        _thread_buffers.pose_detector = detector
+    return detector
+
+def thread_buffer(name: str, shape: Tuple[int, ...], dtype) -> np.ndarray:
+    """Return this thread's scratch array for name, reallocating only when shape or dtype changes"""
+    buf = getattr(_thread_buffers, name, None)
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        buf = np.empty(shape, dtype=dtype)
+        setattr(_thread_buffers, name, buf)
+    return buf
+
+def load_frame(image_bytes: bytes) -> Tuple[Optional[np.ndarray], Optional[bytes], Optional[np.ndarray]]:
+    """Decode an upload, fingerprint it for the frame cache and resize it for the CNN"""
+    img = decode_image(image_bytes)
+    if img is None:
+        return None, None, None
+    # Area averaging: bilinear skips most source pixels on a large downscale and aliases
+    img_224 = cv2.resize(img, (224, 224), interpolation=cv2.INTER_AREA)
+    # The CNN was trained on BGR frames; swapping the small copy is ~1% of a full-frame swap
+    cv2.cvtColor(img_224, cv2.COLOR_RGB2BGR, dst=img_224)
+    return img, frame_key(img), img_224
+
+def run_pose(img: np.ndarray, session_id: Optional[str] = None) -> Dict[str, Any]:
+    """MediaPipe pass: arm angle and hand position"""
+    results = {}
+    
+    # Pose cost grows with pixel count; landmarks are normalized, so a smaller frame gives the same coordinates
+    scale = POSE_MAX_SIDE / max(img.shape[:2])
+    if scale < 1.0:
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
+    # Frames are decoded as RGB, which is what MediaPipe expects
+    if session_id:
+        detector, lock = session_pose_detectors.get(session_id)
+        with lock:
+            # Closed if the session was evicted between get() and here; fall back to a static detector
+            landmarks = (thread_pose_detector() if detector.closed else detector).detect(img)
+    else:
+        # Static-image mode keeps no state between frames, so each worker thread can own one and skip the lock
+        landmarks = thread_pose_detector().detect(img)
+    
+    if landmarks is not None:
+        results["pose_detected"] = True
+        h, w = img.shape[:2]
+        
+        left_shoulder, left_elbow = landmarks[LEFT_SHOULDER], landmarks[LEFT_ELBOW]
+        left_wrist, right_wrist = landmarks[LEFT_WRIST], landmarks[RIGHT_WRIST]
+        
+        # Calculate arm angle (in pixel space; w != h, so the scaling doesn't cancel out)
+        arm_angle = get_angle(
+            left_shoulder.x * w, left_shoulder.y * h, left_shoulder.z * w,
+            left_elbow.x * w, left_elbow.y * h, left_elbow.z * w,
+            left_wrist.x * w, left_wrist.y * h, left_wrist.z * w
+        )
+        results["arm_angle"] = arm_angle
+        
+        # Get hand position
+        wrist_x = (left_wrist.x + right_wrist.x) / 2
+        wrist_y = (left_wrist.y + right_wrist.y) / 2
+        results["hand_x"] = wrist_x
+        results["hand_y"] = wrist_y
+    
+    return results
+
+def batch_bucket(n: int) -> int:
+    """Batch size to run n frames at: the model's fixed batch, else the next power of two"""
+    fixed = getattr(cnn_model, "max_batch", None)
+    if fixed:
+        return fixed
+    return 1 << (n - 1).bit_length()
+
+def predict_batch(images: List[np.ndarray]) -> np.ndarray:
+    """Run the CNN once over a list of 224x224 uint8 frames"""
+    # Padding to a few bucket sizes means TFLite reallocates, and XLA recompiles the Keras graph,
+    # once per bucket instead of once per distinct batch size
+    size = batch_bucket(len(images))
+    if getattr(cnn_model, "uint8_alpha", None):
+        # Quantized-input model: skip the float stage and let the predictor quantize the raw pixels
+        return cnn_model.predict_frames(images, size)[:len(images)]
+    
+    shape = (max(size, cnn_batcher.max_batch), 224, 224, 3)
+    batch = thread_buffer("cnn_batch", shape, np.float32)[:size]
+    # Scale each frame to [0,1] float32 straight into its batch slot; padding rows keep
+    # whatever they held and their outputs are dropped
+    for i, image in enumerate(images):
+        np.multiply(image, np.float32(1 / 255.0), out=batch[i])
+    return cnn_model.predict(batch, verbose=0)[:len(images)]
+
+class InferenceBatcher:
+    """Coalesces concurrent CNN requests into batched predict() calls."""
+    def __init__(self, max_batch: int = CNN_MAX_BATCH, max_wait: float = 0.010):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue: Optional[asyncio.Queue] = None
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.task: Optional[asyncio.Task] = None
+        # Dispatch tasks still running; the event loop only keeps weak references to tasks
+        self._inflight: set = set()
+
+    def start(self, concurrency: int = 1) -> None:
+        self.queue = asyncio.Queue()
+        # Batches in flight at once; more than the model can run in parallel would just queue in the pool
+        self.slots = asyncio.Semaphore(concurrency)
+        self.task = asyncio.create_task(self._run())
+        self.task.add_done_callback(self._run_finished)
+
+    async def stop(self) -> None:
+        """Cancel the batching loop, let the batches already running finish and fail the frames still queued"""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        # The model call can't be interrupted mid-batch, so wait for it rather than orphan its frames
+        await asyncio.gather(*self._inflight, return_exceptions=True)
+        if self.queue is not None:
+            self._fail(self._drain(), RuntimeError("CNN batching loop stopped"))
+
+    def _run_finished(self, task: asyncio.Task) -> None:
+        """Log a crashed batching loop and fail the frames still queued, instead of leaving them waiting"""
+        if task.cancelled():
+            return
+        error = task.exception()
+        logger.error("CNN batching loop stopped", exc_info=error)
+        self._fail(self._drain(), RuntimeError(f"CNN batching loop stopped: {error}"))
+
+    def _dispatch_finished(self, task: asyncio.Task) -> None:
+        self._inflight.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("CNN batch dispatch failed", exc_info=task.exception())
+
+    def _drain(self) -> List[Tuple[asyncio.Future, np.ndarray]]:
+        """Take every frame still waiting in the queue"""
+        items = []
+        while not self.queue.empty():
+            items.append(self.queue.get_nowait())
+        return items
+
+    @staticmethod
+    def _fail(items: List[Tuple[asyncio.Future, np.ndarray]], error: Exception) -> None:
+        for future, _ in items:
+            if not future.done():
+                future.set_exception(error)
+
+    async def submit(self, img_224: np.ndarray) -> np.ndarray:
+        """Queue one frame and wait for its row of predictions"""
+        if self.task is None or self.task.done():
+            raise RuntimeError("CNN batching loop is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((future, img_224))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for a free slot first, so frames keep batching up while every slot is busy
+            await self.slots.acquire()
+            # Block for the first frame, then gather more until the batch fills or max_wait passes
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            try:
+                while len(items) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Stopped mid-gather: these frames are already off the queue
+                self._fail(items, RuntimeError("CNN batching loop stopped"))
+                raise
+            task = asyncio.create_task(self._dispatch(items))
+            self._inflight.add(task)
+            task.add_done_callback(self._dispatch_finished)
+
+    async def _dispatch(self, items: List[Tuple[asyncio.Future, np.ndarray]]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            predictions = await loop.run_in_executor(INFERENCE_POOL, predict_batch, [img for _, img in items])
+        except Exception as e:
+            self._fail(items, e)
+            return
+        finally:
+            self.slots.release()
+        for (future, _), row in zip(items, predictions):
+            if not future.done():
+                future.set_result(row)
+
+cnn_batcher = InferenceBatcher()
 
-def analyze_cpr_image(image_bytes: bytes) -> Dict[str, Any]:
+# Use only the good predictions
+# Don't use predictions[0] (arm angle) or predictions[5] (torso lean) - they suck
+CNN_OUTPUT_INDICES = np.array([
+    1,  # depth: compression depth - MAE 0.19
+    3,  # hand_offset_x: MAE 0.19
+    4,  # hand_offset_y: MAE 0.26
+    7,  # phase: compression phase
+    8,  # quality: overall quality - MAE 0.04
+])
+CNN_OUTPUT_NAMES = ("depth", "hand_offset_x", "hand_offset_y", "phase", "quality")
+
+async def run_cnn(img_224: np.ndarray) -> Dict[str, Any]:
+    """CNN pass: depth, hand offset, phase and quality"""
+    # Get predictions
+    predictions = await cnn_batcher.submit(img_224)
+    
+    # Pull the used outputs in one gather; tolist() converts them to Python floats in C.
+    # Slim exports (convert_model.py --slim) only have the used outputs, already in order
+    if predictions.shape[-1] > len(CNN_OUTPUT_NAMES):
+        predictions = predictions[CNN_OUTPUT_INDICES]
+    return dict(zip(CNN_OUTPUT_NAMES, predictions.tolist()))
+
+# Defaults for every analysis; copied per frame, which is a single C-level dict copy
+RESULT_TEMPLATE = {
+    "pose_detected": False,
+    "arm_angle": 0,
+    "depth": 0,
+    "hand_x": 0.5,
+    "hand_y": 0.5,
+    "quality": 0,
+    "phase": 0
+}
+
+async def analyze_cpr_image(image_bytes: bytes, session_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Analyze CPR technique from image using both MediaPipe and CNN
     """
     try:
+        loop = asyncio.get_running_loop()
+        
         # Convert bytes to opencv image
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img, key, img_224 = await loop.run_in_executor(PREPROCESS_POOL, load_frame, image_bytes)
         
         if img is None:
             return {"error": "Invalid image"}
         
-        # Convert BGR to RGB for mediapipe
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        
-        results = {
-            "pose_detected": False,
-            "arm_angle": 0,
-            "depth": 0,
-            "hand_x": 0.5,
-            "hand_y": 0.5,
-            "quality": 0,
-            "phase": 0
-        }
+        # Skip both models for a frame we've just analysed
+        cached = frame_cache.get(key)
+        if cached is not None:
+            return dict(cached)
         
-        # ===== MEDIAPIPE ANALYSIS (for accurate arm angles) =====
-        if pose_detector:
-            pose_results = pose_detector.process(img_rgb)
-            
-            if pose_results.pose_landmarks:
-                results["pose_detected"] = True
-                landmarks = pose_results.pose_landmarks.landmark
-                h, w = img.shape[:2]
-                
-                # Calculate arm angle
-                left_shoulder = np.array([
-                    landmarks[11].x * w, 
-                    landmarks[11].y * h, 
-                    landmarks[11].z * w
-                ])
-                left_elbow = np.array([
-                    landmarks[13].x * w, 
-                    landmarks[13].y * h, 
-                    landmarks[13].z * w
-                ])
-                left_wrist = np.array([
-                    landmarks[15].x * w, 
-                    landmarks[15].y * h, 
-                    landmarks[15].z * w
-                ])
-                
-                arm_angle = get_angle(left_shoulder, left_elbow, left_wrist)
-                results["arm_angle"] = arm_angle
-                
-                # Get hand position
-                wrist_x = (landmarks[15].x + landmarks[16].x) / 2
-                wrist_y = (landmarks[15].y + landmarks[16].y) / 2
-                results["hand_x"] = wrist_x
-                results["hand_y"] = wrist_y
-        
-        # ===== CNN MODEL ANALYSIS (for depth and quality) =====
-        if cnn_model:
-            # Resize for CNN
-            img_224 = cv2.resize(img, (224, 224))
-            img_224 = img_224.astype(np.float32) / 255.0
-            img_224 = np.expand_dims(img_224, axis=0)
-            
-            # Get predictions
-            predictions = cnn_model.predict(img_224, verbose=0)[0]
-            
-            # Use only the good predictions
-            results["depth"] = float(predictions[1])  # compression depth - MAE 0.19
-            results["hand_offset_x"] = float(predictions[3])  # MAE 0.19
-            results["hand_offset_y"] = float(predictions[4])  # MAE 0.26
-            results["phase"] = float(predictions[7])  # compression phase
-            results["quality"] = float(predictions[8])  # overall quality - MAE 0.04
-            
-            # Don't use predictions[0] (arm angle) or predictions[5] (torso lean) - they suck
+        results = RESULT_TEMPLATE.copy()
         
+        if SKIP_CNN_WITHOUT_POSE and pose_available:
+            # Pose first; the CNN only runs on frames with someone in them
+            results.update(await loop.run_in_executor(INFERENCE_POOL, run_pose, img, session_id))
+            if cnn_model and results["pose_detected"]:
+                results.update(await run_cnn(img_224))
+        else:
+            # MediaPipe (accurate arm angles) and CNN (depth and quality) are independent
+            passes = []
+            if pose_available:
+                passes.append(loop.run_in_executor(INFERENCE_POOL, run_pose, img, session_id))
+            if cnn_model:
+                passes.append(run_cnn(img_224))
+            for partial in await asyncio.gather(*passes):
+                results.update(partial)
+        
+        frame_cache.put(key, dict(results))
         return results
         
     except Exception as e:
         logger.error(f"Error analyzing image: {e}")
         return {"error": str(e)}
 
+# Guidance priorities, ordered so the most severe one wins with max()
+PRIORITY_NORMAL, PRIORITY_WARNING, PRIORITY_CRITICAL = 0, 1, 2
+PRIORITY_NAMES = ("normal", "warning", "critical")
+
+# Threshold tables: bisect_right(THRESHOLDS, value) picks the tier, which indexes FEEDBACK and PRIORITY
+# Arm angle: < 150 critical, < 160 warning
+ARM_ANGLE_THRESHOLDS = (150, 160)
+ARM_ANGLE_FEEDBACK = ("STRAIGHTEN YOUR ARMS", "Arms need to be straighter", None)
+ARM_ANGLE_PRIORITY = (PRIORITY_CRITICAL, PRIORITY_WARNING, PRIORITY_NORMAL)
+# Depth (inches): < 1.8 critical, < 2.0 warning, > 2.4 warning (2.4 itself is fine, hence nextafter)
+DEPTH_THRESHOLDS = (1.8, 2.0, math.nextafter(2.4, math.inf))
+DEPTH_FEEDBACK = ("PRESS DEEPER - at least 2 inches", "Press a bit deeper", None, "Too deep - ease up")
+DEPTH_PRIORITY = (PRIORITY_CRITICAL, PRIORITY_WARNING, PRIORITY_NORMAL, PRIORITY_WARNING)
+
 def generate_guidance(analysis: Dict[str, Any]) -> Dict[str, Any]:
     """
     Generate CPR guidance based on analysis results
     """
     feedback = []
-    priority = "normal"
+    priority = PRIORITY_NORMAL
     
     # Check arm angle (from MediaPipe - accurate)
     if analysis.get("pose_detected"):
-        arm_angle = analysis.get("arm_angle", 0)
-        if arm_angle < 150:
-            feedback.append("STRAIGHTEN YOUR ARMS")
-            priority = "critical"
-        elif arm_angle < 160:
-            feedback.append("Arms need to be straighter")
-            priority = "warning"
+        tier = bisect.bisect_right(ARM_ANGLE_THRESHOLDS, analysis.get("arm_angle", 0))
+        if ARM_ANGLE_FEEDBACK[tier]:
+            feedback.append(ARM_ANGLE_FEEDBACK[tier])
+            priority = max(priority, ARM_ANGLE_PRIORITY[tier])
     
     # Check depth (from CNN - accurate)
     depth = analysis.get("depth", 0)
     if depth > 0:
-        if depth < 1.8:
-            feedback.append("PRESS DEEPER - at least 2 inches")
-            priority = "critical"
-        elif depth < 2.0:
-            feedback.append("Press a bit deeper")
-            if priority == "normal":
-                priority = "warning"
-        elif depth > 2.4:
-            feedback.append("Too deep - ease up")
-            if priority == "normal":
-                priority = "warning"
+        tier = bisect.bisect_right(DEPTH_THRESHOLDS, depth)
+        if DEPTH_FEEDBACK[tier]:
+            feedback.append(DEPTH_FEEDBACK[tier])
+            priority = max(priority, DEPTH_PRIORITY[tier])
     
     # Check hand position
     hand_x = analysis.get("hand_x", 0.5)
     if abs(hand_x - 0.5) > 0.15:
         feedback.append("CENTER YOUR HANDS on the chest")
-        if priority == "normal":
-            priority = "warning"
+        priority = max(priority, PRIORITY_WARNING)
     
     # Overall quality
     quality = analysis.get("quality", 0)
@@ -254,14 +918,15 @@ def generate_guidance(analysis: Dict[str, Any]) -> Dict[str, Any]:
     # Determine main instruction
     if len(feedback) == 0:
         main_instruction = "Good CPR technique! Keep going!"
-        priority = "good"
+        priority_name = "good"
     else:
         main_instruction = feedback[0]  # Most important issue
+        priority_name = PRIORITY_NAMES[priority]
     
     return {
         "instruction": main_instruction,
         "all_feedback": feedback,
-        "priority": priority,
+        "priority": priority_name,
         "metrics": {
             "arm_angle": round(analysis.get("arm_angle", 0), 1),
             "depth_inches": round(analysis.get("depth", 0), 2),
@@ -271,51 +936,68 @@ def generate_guidance(analysis: Dict[str, Any]) -> Dict[str, Any]:
         }
     }
 
+# Cap on correction records sent to the model; more only adds prompt tokens and latency
+SUMMARY_MAX_CORRECTIONS = 50
+
+SUMMARY_SYSTEM_PROMPT = "You are a CPR training expert providing feedback on training sessions."
+
+SUMMARY_PROMPT_TEMPLATE = """
+You are an expert CPR instructor analyzing a training session. Please provide a comprehensive summary based on the following data:
+
+Session ID: {session_id}
+Duration: {duration_minutes} minutes
+Total Compressions: {compression_count}
+Performance Score: {performance_score}/100
+Total Corrections: {total_corrections}
+Critical Errors: {critical_errors}
+
+Correction Details:
+{corrections}
+
+Please provide:
+1. A brief overview of the session performance
+2. Specific areas that need improvement (if any)
+3. Strengths demonstrated
+4. Recommendations for the next training session
+
+Keep the tone professional and encouraging. Limit to 3-4 paragraphs.
+"""
+
+def build_summary_messages(session_id: str, analysis_data: Dict[str, Any]) -> List[Dict[str, str]]:
+    """
+    Build the chat messages for a CPR session summary
+    """
+    corrections = analysis_data.get("corrections", [])
+    if isinstance(corrections, list):
+        corrections = corrections[:SUMMARY_MAX_CORRECTIONS]
+    
+    # Build prompt with session data; compact JSON keeps the token count down
+    prompt = SUMMARY_PROMPT_TEMPLATE.format_map({
+        "session_id": session_id,
+        "duration_minutes": analysis_data.get("durationMinutes", 0),
+        "compression_count": analysis_data.get("totalCompressions", 0),
+        "performance_score": analysis_data.get("performanceScore", 0),
+        "total_corrections": analysis_data.get("totalCorrections", 0),
+        "critical_errors": analysis_data.get("criticalErrors", 0),
+        "corrections": orjson.dumps(corrections).decode() if corrections else "None"
+    })
+    
+    return [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
 async def generate_cpr_summary(session_id: str, analysis_data: Dict[str, Any]) -> str:
     """
     Generate AI-powered summary of CPR session using OpenAI
     """
     try:
-        if not OPENAI_API_KEY:
+        if not openai_client:
             return "OpenAI API key not configured. Summary generation unavailable."
         
-        # Extract key metrics from analysis data
-        total_corrections = analysis_data.get("totalCorrections", 0)
-        critical_errors = analysis_data.get("criticalErrors", 0)
-        performance_score = analysis_data.get("performanceScore", 0)
-        corrections = analysis_data.get("corrections", [])
-        duration_minutes = analysis_data.get("durationMinutes", 0)
-        compression_count = analysis_data.get("totalCompressions", 0)
-        
-        # Build prompt with session data
-        prompt = f"""
-        You are an expert CPR instructor analyzing a training session. Please provide a comprehensive summary based on the following data:
-
-        Session ID: {session_id}
-        Duration: {duration_minutes} minutes
-        Total Compressions: {compression_count}
-        Performance Score: {performance_score}/100
-        Total Corrections: {total_corrections}
-        Critical Errors: {critical_errors}
-
-        Correction Details:
-        {json.dumps(corrections, indent=2) if corrections else "None"}
-
-        Please provide:
-        1. A brief overview of the session performance
-        2. Specific areas that need improvement (if any)
-        3. Strengths demonstrated
-        4. Recommendations for the next training session
-
-        Keep the tone professional and encouraging. Limit to 3-4 paragraphs.
-        """
-        
-        response = openai.ChatCompletion.create(
+        response = await openai_client.chat.completions.create(
             model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a CPR training expert providing feedback on training sessions."},
-                {"role": "user", "content": prompt}
-            ],
+            messages=build_summary_messages(session_id, analysis_data),
             max_tokens=500,
             temperature=0.7
         )
@@ -326,21 +1008,99 @@ async def generate_cpr_summary(session_id: str, analysis_data: Dict[str, Any]) -
         logger.error(f"Error generating AI summary: {e}")
         return f"Error generating summary: {str(e)}. Please try again later."
 
+def sse_event(data: str) -> bytes:
+    """Encode one server-sent event; the payload is JSON so newlines in tokens survive"""
+    return b"data: " + orjson.dumps(data) + b"\n\n"
+
+async def stream_cpr_summary(session_id: str, analysis_data: Dict[str, Any]):
+    """
+    Stream the session summary as server-sent events, one per token delta
+    """
+    try:
+        if not openai_client:
+            yield sse_event("OpenAI API key not configured. Summary generation unavailable.")
+        else:
+            stream = await openai_client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=build_summary_messages(session_id, analysis_data),
+                max_tokens=500,
+                temperature=0.7,
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield sse_event(chunk.choices[0].delta.content)
+        
+    except Exception as e:
+        logger.error(f"Error streaming AI summary: {e}")
+        yield sse_event(f"Error generating summary: {str(e)}. Please try again later.")
+    yield b"data: [DONE]\n\n"
+
+# Uploads are pulled off the request body in 1 MiB chunks
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+async def read_upload(file: UploadFile) -> bytearray:
+    """Read an upload into one buffer, sized up front when the upload's length is known"""
+    # SpooledTemporaryFile only has readinto() from Python 3.11; older versions use the chunked loop
+    if file.size and hasattr(file.file, "readinto"):
+        # Fill a buffer of the final size directly: no per-chunk bytes objects, no regrowth
+        buf = bytearray(file.size)
+        n = await run_in_threadpool(file.file.readinto, buf)
+        if n == file.size:
+            return buf
+        del buf[n:]
+    else:
+        buf = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        buf += chunk
+    return buf
+
+async def write_file(path: str, data: bytes) -> None:
+    """Write a whole file without blocking the event loop"""
+    async with aiofiles.open(path, "wb") as f:
+        await f.write(data)
+
 # ============== API ENDPOINTS ==============
 
+def start_batcher():
+    """Start the CNN micro-batching loop on the server's event loop"""
+    if cnn_model:
+        # Respect models exported with a fixed batch size
+        cnn_batcher.max_batch = getattr(cnn_model, "max_batch", None) or cnn_batcher.max_batch
+        cnn_batcher.start(getattr(cnn_model, "concurrency", 1))
+
+async def preload_pose_detectors():
+    """Build every inference thread's pose detector now rather than on each thread's first request"""
+    if not pose_available:
+        return
+    loop = asyncio.get_running_loop()
+    # The barrier holds each task until all have started, so every task lands on a different pool thread;
+    # the timeout keeps a busy pool thread from hanging startup
+    barrier = threading.Barrier(INFERENCE_WORKERS, timeout=30.0)
+    def preload():
+        try:
+            barrier.wait()
+        except threading.BrokenBarrierError:
+            logger.warning("Pose detector preload timed out; remaining threads will build theirs on first use")
+            return
+        thread_pose_detector().detect(np.zeros((224, 224, 3), dtype=np.uint8))
+    await asyncio.gather(*(loop.run_in_executor(INFERENCE_POOL, preload) for _ in range(INFERENCE_WORKERS)))
+
+# Models are loaded once at import, so the status payloads never change; build them once
+ROOT_STATUS = {
+    "message": "Rescue CPR Backend is running",
+    "status": "healthy",
+    "models_loaded": cnn_model is not None and pose_available,
+    "version": "2.0"
+}
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    models_loaded = cnn_model is not None and pose_detector is not None
-    return {
-        "message": "Rescue CPR Backend is running",
-        "status": "healthy",
-        "models_loaded": models_loaded,
-        "version": "2.0"
-    }
+    return ROOT_STATUS
 
 @app.post("/analyze-hands")
-async def analyze_hands(file: UploadFile = File(...)):
+async def analyze_hands(file: UploadFile = File(...), session_id: str = Form(None)):
     """
     Analyze CPR technique from photo using real models
     """
@@ -350,17 +1110,25 @@ async def analyze_hands(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="File must be an image")
         
         # Read image data
-        image_data = await file.read()
+        image_data = await read_upload(file)
         logger.info(f"Received photo: {file.filename}, size: {len(image_data)} bytes")
         
-        # Analyze with real models
-        analysis = analyze_cpr_image(image_data)
-        
-        if "error" in analysis:
-            raise HTTPException(status_code=500, detail=analysis["error"])
-        
-        # Generate guidance
-        guidance = generate_guidance(analysis)
+        # Same bytes already analysed by either endpoint: skip decoding them again
+        image_key = upload_key(image_data)
+        cached = upload_cache.get(image_key)
+        if cached is not None:
+            analysis, guidance = cached
+        else:
+            # Analyze with real models; a session_id lets MediaPipe track the pose across that session's frames
+            analysis = await analyze_cpr_image(image_data, session_id)
+            
+            if "error" in analysis:
+                raise HTTPException(status_code=500, detail=analysis["error"])
+            
+            # Generate guidance
+            guidance = generate_guidance(analysis)
+            # The client usually uploads this same photo next; let /upload-photo reuse the work
+            upload_cache.put(image_key, (analysis, guidance))
         
         response = {
             "success": True,
@@ -383,8 +1151,46 @@ async def analyze_hands(file: UploadFile = File(...)):
         logger.error(f"Error processing photo: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing photo: {str(e)}")
 
+# JPEG quality for the stored QA copies; 0 keeps the uploaded bytes as-is
+PHOTO_JPEG_QUALITY = int(os.getenv("PHOTO_JPEG_QUALITY", "0"))
+
+def reencode_photo(image_data: bytes) -> bytes:
+    """Re-encode an upload at PHOTO_JPEG_QUALITY, keeping the original when that isn't smaller"""
+    if turbo_jpeg is not None and image_data[:2] == b"\xff\xd8":
+        try:
+            # libjpeg-turbo's SIMD DCT and color conversion on both legs of the round trip; the EXIF block
+            # isn't carried over, so rotate the pixels upright first, as cv2.imdecode does below
+            img = apply_orientation(turbo_jpeg.decode(image_data), exif_orientation(image_data))
+            encoded = turbo_jpeg.encode(img, quality=PHOTO_JPEG_QUALITY)
+            return encoded if len(encoded) < len(image_data) else image_data
+        except OSError as e:
+            logger.warning(f"TurboJPEG re-encode failed, falling back to OpenCV: {e}")
+    img = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return image_data
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, PHOTO_JPEG_QUALITY])
+    return buf.tobytes() if ok and buf.nbytes < len(image_data) else image_data
+
+async def save_photo(filepath: str, image_data: bytes, json_path: str, sidecar: Dict[str, Any]) -> None:
+    """Write an uploaded photo and its analysis sidecar, after the response has gone out"""
+    try:
+        if PHOTO_JPEG_QUALITY:
+            image_data = await asyncio.get_running_loop().run_in_executor(PREPROCESS_POOL, reencode_photo, image_data)
+        # The two files are independent, so write them concurrently on aiofiles' threads
+        await asyncio.gather(
+            write_file(filepath, image_data),
+            write_file(json_path, orjson.dumps(sidecar, option=ORJSON_OPTIONS | orjson.OPT_INDENT_2))
+        )
+        # Listing endpoints pick it up without reading it back from disk
+        photo_index.put(json_path, sidecar)
+        logger.info(f"Photo saved with analysis: {filepath}")
+    except Exception as e:
+        # Nothing left to report it to; the client already has its analysis
+        logger.error(f"Error saving photo {filepath}: {e}")
+
 @app.post("/upload-photo")
 async def upload_photo(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user_id: str = Form(None),
     session_id: str = Form(None),
@@ -401,13 +1207,12 @@ async def upload_photo(
             raise HTTPException(status_code=400, detail="File must be an image")
         
         # Read image data
-        image_data = await file.read()
+        image_data = await read_upload(file)
         
         # Use Mentra glasses analysis if available, otherwise do backend analysis
         if mentra_analysis and mentra_guidance:
             # Parse Mentra analysis
-            import json
-            mentra_data = json.loads(mentra_analysis)
+            mentra_data = orjson.loads(mentra_analysis)
             
             # Create analysis structure compatible with our system
             analysis = {
@@ -425,9 +1230,16 @@ async def upload_photo(
                 }
             }
         else:
-            # Fallback to backend analysis
-            analysis = analyze_cpr_image(image_data)
-            guidance = generate_guidance(analysis)
+            # Fallback to backend analysis, reusing /analyze-hands results for the same bytes
+            image_key = upload_key(image_data)
+            cached = upload_cache.get(image_key)
+            if cached is not None:
+                analysis, guidance = dict(cached[0]), cached[1]
+            else:
+                analysis = await analyze_cpr_image(image_data, session_id)
+                guidance = generate_guidance(analysis)
+                if "error" not in analysis:
+                    upload_cache.put(image_key, (dict(analysis), guidance))
             analysis["source"] = "backend"
         
         # Save photo with analysis results
@@ -436,25 +1248,21 @@ async def upload_photo(
         filename = f"cpr_{user_id or 'unknown'}_{timestamp_str}_q{quality:.0f}.jpg"
         filepath = os.path.join(PHOTOS_DIR, filename)
         
-        with open(filepath, "wb") as f:
-            f.write(image_data)
-        
         # Save analysis results as json
         json_path = filepath.replace('.jpg', '_analysis.json')
-        with open(json_path, 'w') as f:
-            json.dump({
-                "analysis": analysis,
-                "guidance": guidance,
-                "user_id": user_id,
-                "session_id": session_id,
-                "timestamp": datetime.now().isoformat()
-            }, f, indent=2)
-        
-        logger.info(f"Photo saved with analysis: {filepath}")
+        sidecar = {
+            "analysis": analysis,
+            "guidance": guidance,
+            "user_id": user_id,
+            "session_id": session_id,
+            "timestamp": datetime.now().isoformat()
+        }
+        # The QA copy isn't needed for the response, so the glasses get their guidance without waiting on the disk
+        background_tasks.add_task(save_photo, filepath, image_data, json_path, sidecar)
         
         return {
             "success": True,
-            "message": "Photo uploaded and analyzed",
+            "message": "Photo analyzed; saving in the background",
             "analysis": guidance,
             "file_path": filepath
         }
@@ -477,6 +1285,17 @@ async def generate_summary(request: SummaryRequest):
         logger.error(f"Error in generate-summary endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Error generating summary: {str(e)}")
 
+@app.post("/generate-summary/stream")
+async def generate_summary_stream(request: SummaryRequest):
+    """
+    Stream the AI-powered session summary as it is generated (text/event-stream)
+    """
+    return StreamingResponse(
+        stream_cpr_summary(request.sessionId, request.analysisData),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
 @app.get("/photos/{filename}")
 async def get_photo(filename: str):
     """Serve photo files"""
@@ -490,39 +1309,83 @@ async def get_photo(filename: str):
         logger.error(f"Error serving photo {filename}: {e}")
         raise HTTPException(status_code=500, detail=f"Error serving photo: {str(e)}")
 
+class PhotoIndex:
+    """In-memory copy of the photo analysis sidecars, re-read only when a file's mtime changes."""
+    def __init__(self, photos_dir: str):
+        self.photos_dir = photos_dir
+        # sidecar name -> (mtime, parsed JSON or None if it failed to parse)
+        self._entries: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, json_path: str, data: Dict[str, Any]) -> None:
+        """Record a sidecar just written by /upload-photo so the next listing doesn't read it back"""
+        mtime = os.stat(json_path).st_mtime
+        with self._lock:
+            self._entries[os.path.basename(json_path)] = (mtime, data)
+
+    def scan(self) -> Tuple[List[Tuple[str, float, Dict[str, Any]]], set]:
+        """Return (sidecar name, mtime, data) for every readable sidecar, plus all file names, in one directory sweep"""
+        filenames = set()
+        stale = []
+        with self._lock:
+            entries = dict(self._entries)
+        with os.scandir(self.photos_dir) as it:
+            for entry in it:
+                filenames.add(entry.name)
+                if entry.name.endswith("_analysis.json"):
+                    # DirEntry caches the stat result
+                    mtime = entry.stat().st_mtime
+                    cached = entries.get(entry.name)
+                    if cached is None or cached[0] != mtime:
+                        stale.append((entry.name, entry.path, mtime))
+        
+        for name, path, mtime in stale:
+            try:
+                with open(path, 'rb') as f:
+                    data = orjson.loads(f.read())
+            except Exception as e:
+                # Cached as unreadable until the file changes, so it's logged once
+                logger.error(f"Error reading {path}: {e}")
+                data = None
+            entries[name] = (mtime, data)
+        
+        # Forget sidecars that were deleted
+        for name in entries.keys() - filenames:
+            del entries[name]
+        with self._lock:
+            self._entries = entries
+        
+        return [(name, mtime, data) for name, (mtime, data) in entries.items() if data is not None], filenames
+
+photo_index = PhotoIndex(PHOTOS_DIR)
+
+async def prime_photo_index():
+    """Read the existing sidecars once at startup, so the first listing doesn't pay for the whole history"""
+    await run_in_threadpool(photo_index.scan)
+
 @app.get("/recent-photos")
 async def get_recent_photos(limit: int = 10):
     """Get recent photos with analysis"""
     try:
-        import glob
-        import json
-        
-        # Get all analysis JSON files
-        json_files = glob.glob(os.path.join(PHOTOS_DIR, "*_analysis.json"))
+        # Get all analysis JSON files; the directory sweep is blocking I/O, so keep it off the event loop
+        json_entries, filenames = await run_in_threadpool(photo_index.scan)
         
         # Sort by modification time (newest first)
-        json_files.sort(key=os.path.getmtime, reverse=True)
+        json_entries.sort(key=lambda item: item[1], reverse=True)
         
         photos = []
-        for json_file in json_files[:limit]:
-            try:
-                with open(json_file, 'r') as f:
-                    analysis_data = json.load(f)
-                
-                # Get corresponding image file
-                image_file = json_file.replace('_analysis.json', '.jpg')
-                if os.path.exists(image_file):
-                    photos.append({
-                        "filename": os.path.basename(image_file),
-                        "timestamp": analysis_data.get("timestamp"),
-                        "user_id": analysis_data.get("user_id"),
-                        "session_id": analysis_data.get("session_id"),
-                        "analysis": analysis_data.get("analysis"),
-                        "guidance": analysis_data.get("guidance")
-                    })
-            except Exception as e:
-                logger.error(f"Error reading {json_file}: {e}")
-                continue
+        for name, _, analysis_data in json_entries[:limit]:
+            # Get corresponding image file
+            image_name = name.replace('_analysis.json', '.jpg')
+            if image_name in filenames:
+                photos.append({
+                    "filename": image_name,
+                    "timestamp": analysis_data.get("timestamp"),
+                    "user_id": analysis_data.get("user_id"),
+                    "session_id": analysis_data.get("session_id"),
+                    "analysis": analysis_data.get("analysis"),
+                    "guidance": analysis_data.get("guidance")
+                })
         
         return {
             "success": True,
@@ -534,16 +1397,15 @@ async def get_recent_photos(limit: int = 10):
         logger.error(f"Error getting recent photos: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting recent photos: {str(e)}")
 
+# Positions counted as poor hand placement in session stats
+POOR_POSITIONS = frozenset(("high", "low", "left", "right", "uncertain", "unknown"))
+
 @app.get("/sessions")
 async def get_sessions():
     """Get all sessions with their photos grouped together"""
     try:
-        import glob
-        import json
-        from collections import defaultdict
-        
-        # Get all analysis JSON files
-        json_files = glob.glob(os.path.join(PHOTOS_DIR, "*_analysis.json"))
+        # Get all analysis JSON files; the directory sweep is blocking I/O, so keep it off the event loop
+        json_entries, filenames = await run_in_threadpool(photo_index.scan)
         
         # Group photos by session_id
         sessions_dict = defaultdict(lambda: {
@@ -560,11 +1422,8 @@ async def get_sessions():
         })
         
         # Process each photo
-        for json_file in json_files:
+        for name, _, analysis_data in json_entries:
             try:
-                with open(json_file, 'r') as f:
-                    analysis_data = json.load(f)
-                
                 session_id = analysis_data.get("session_id", "unknown")
                 user_id = analysis_data.get("user_id", "unknown")
                 timestamp = analysis_data.get("timestamp")
@@ -572,59 +1431,61 @@ async def get_sessions():
                 guidance = analysis_data.get("guidance", "")
                 
                 # Get corresponding image file
-                image_file = json_file.replace('_analysis.json', '.jpg')
-                if os.path.exists(image_file):
+                image_name = name.replace('_analysis.json', '.jpg')
+                if image_name in filenames:
                     photo_data = {
-                        "filename": os.path.basename(image_file),
+                        "filename": image_name,
                         "timestamp": timestamp,
                         "analysis": analysis,
                         "guidance": guidance
                     }
                     
+                    # One lookup per photo instead of one per field
+                    session = sessions_dict[session_id]
+                    
                     # Initialize session data
-                    if sessions_dict[session_id]["session_id"] is None:
-                        sessions_dict[session_id]["session_id"] = session_id
-                        sessions_dict[session_id]["user_id"] = user_id
-                        sessions_dict[session_id]["start_time"] = timestamp
-                        sessions_dict[session_id]["end_time"] = timestamp
+                    if session["session_id"] is None:
+                        session["session_id"] = session_id
+                        session["user_id"] = user_id
+                        session["start_time"] = timestamp
+                        session["end_time"] = timestamp
                     
                     # Add photo to session
-                    sessions_dict[session_id]["photos"].append(photo_data)
-                    sessions_dict[session_id]["total_photos"] += 1
+                    session["photos"].append(photo_data)
+                    session["total_photos"] += 1
                     
                     # Update timing
                     if timestamp:
-                        if not sessions_dict[session_id]["start_time"] or timestamp < sessions_dict[session_id]["start_time"]:
-                            sessions_dict[session_id]["start_time"] = timestamp
-                        if not sessions_dict[session_id]["end_time"] or timestamp > sessions_dict[session_id]["end_time"]:
-                            sessions_dict[session_id]["end_time"] = timestamp
+                        if not session["start_time"] or timestamp < session["start_time"]:
+                            session["start_time"] = timestamp
+                        if not session["end_time"] or timestamp > session["end_time"]:
+                            session["end_time"] = timestamp
                     
                     # Count position types
                     position = analysis.get("position", "uncertain")
                     confidence = analysis.get("confidence", 0)
                     
                     if position == "good":
-                        sessions_dict[session_id]["good_positions"] += 1
-                    elif position in ["high", "low", "left", "right", "uncertain", "unknown"]:
-                        sessions_dict[session_id]["poor_positions"] += 1
+                        session["good_positions"] += 1
+                    elif position in POOR_POSITIONS:
+                        session["poor_positions"] += 1
                     elif position == "no_cpr":
-                        sessions_dict[session_id]["no_cpr_detected"] += 1
-                    
-                    # Update average confidence
-                    current_avg = sessions_dict[session_id]["average_confidence"]
-                    total_photos = sessions_dict[session_id]["total_photos"]
-                    sessions_dict[session_id]["average_confidence"] = ((current_avg * (total_photos - 1)) + confidence) / total_photos
+                        session["no_cpr_detected"] += 1
                     
+                    # Summed here, divided once per session below
+                    session["average_confidence"] += confidence
             except Exception as e:
-                logger.error(f"Error reading {json_file}: {e}")
+                logger.error(f"Error processing {name}: {e}")
                 continue
         
         # Convert to list and sort by start_time (newest first)
         sessions = list(sessions_dict.values())
         sessions.sort(key=lambda x: x["start_time"] or "", reverse=True)
         
-        # Sort photos within each session by timestamp (newest first)
         for session in sessions:
+            # Every session here has at least one photo
+            session["average_confidence"] /= session["total_photos"]
+            # Sort photos within each session by timestamp (newest first)
             session["photos"].sort(key=lambda x: x["timestamp"] or "", reverse=True)
         
         return {
@@ -637,35 +1498,46 @@ async def get_sessions():
         logger.error(f"Error getting sessions: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting sessions: {str(e)}")
 
+HEALTH_STATUS = {
+    "status": "healthy",
+    "service": "rescue-cpr-backend",
+    "version": "2.0.0",
+    "models": {
+        "cnn_model": "loaded" if cnn_model else "not loaded",
+        "mediapipe": "loaded" if pose_available else "not loaded"
+    },
+    "endpoints": [
+        "/",
+        "/analyze-hands",
+        "/upload-photo",
+        "/recent-photos",
+        "/sessions",
+        "/health"
+    ],
+    "photos_directory": PHOTOS_DIR
+}
+
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
-    models_status = {
-        "cnn_model": "loaded" if cnn_model else "not loaded",
-        "mediapipe": "loaded" if pose_detector else "not loaded"
-    }
-    
-    return {
-        "status": "healthy",
-        "service": "rescue-cpr-backend",
-        "version": "2.0.0",
-        "models": models_status,
-        "endpoints": [
-            "/",
-            "/analyze-hands",
-            "/upload-photo",
-            "/recent-photos",
-            "/sessions",
-            "/health"
-        ],
-        "photos_directory": PHOTOS_DIR
-    }
+    return HEALTH_STATUS
 
 if __name__ == "__main__":
+    # RELOAD=true gives the single-worker auto-reload dev server
+    reload = os.getenv("RELOAD", "false").lower() == "true"
+    # Each worker loads its own copy of the models, so keep this well under the core count
+    workers = 1 if reload else int(os.getenv("WEB_CONCURRENCY", max(2, (os.cpu_count() or 2) // 2)))
+    # Worker processes inherit this and size their thread pools to cores / workers
+    os.environ["WEB_CONCURRENCY"] = str(workers)
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        reload=reload,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        # Shed load with 503s instead of queueing unbounded inference work
+        limit_concurrency=int(os.getenv("LIMIT_CONCURRENCY", "64")),
         log_level="info"
     )